@@ -0,0 +1,288 @@
+# Batch OCR + summarization
+# Usage:
+#   python batchSummarize.py "scans/*.jpg" -o summaries.jsonl
+#   python batchSummarize.py notes/ --engine handwritten -o notes.jsonl
+#
+# Install dependencies
+# !apt-get install -y tesseract-ocr
+# !pip install pytesseract pillow numpy transformers torch
+# !pip install pdf2image     (only for PDF input)
+# !pip install chandra-ocr   (only for --engine handwritten)
+
+# import libraries
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from transformers import pipeline
+
+from ocrStage import OCRStage, count_pages, load_page
+from textChunking import MAX_CHUNK_TOKENS, chunk_text
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp", ".pdf")
+
+# Summarization model per OCR engine (same pairing as ocrPrinted.py / ocrHandwritten.py)
+ENGINE_MODELS = {
+    "printed": "facebook/bart-large-cnn",
+    "handwritten": "facebook/bart-large-xsum",
+}
+
+# Chunks are summarized in groups of similar token length
+LENGTH_BUCKETS = [64, 128, 256, 512, MAX_CHUNK_TOKENS + 2]
+
+
+# --- Input ---
+
+def collect_images(inputs):
+    """
+    Expands directories and glob patterns into a sorted list of image paths.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = [os.path.join(item, name) for name in os.listdir(item)]
+        else:
+            candidates = glob.glob(item)
+        paths.extend(p for p in candidates if p.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(set(paths))
+
+
+def clean_text(text):
+    text = re.sub(r'<[^>]+>', '', text)  # strip markup left by layout OCR
+    return re.sub(r'[\n\f]+', ' ', text).strip()
+
+
+# --- OCR engines (loaded once per run) ---
+
+class PrintedOCR:
+    """
+    Tesseract OCR via OCRStage: preprocessed pages of every document are
+    OCR'd on a process pool and cached by content hash.
+    """
+
+    def __init__(self, workers, cache_dir):
+        self.stage = OCRStage(cache_dir=cache_dir, workers=workers)
+
+    def ocr_batch(self, paths):
+        documents = []
+        for path in paths:
+            with open(path, "rb") as f:
+                documents.append((os.path.basename(path), f.read()))
+        results = self.stage.ocr_documents(documents)
+        return [(clean_text(" ".join(r["pages"])), r["seconds"]) for r in results]
+
+
+class HandwrittenOCR:
+    """
+    Chandra OCR/layout extraction. The model takes a batch of images per call;
+    multi-page files (PDF, TIFF) are split into pages with ocrStage.
+    """
+
+    def __init__(self, workers, cache_dir):
+        from chandra.model import InferenceManager
+        from chandra.model.schema import BatchInputItem
+        self.BatchInputItem = BatchInputItem
+        self.manager = InferenceManager(method="hf")
+
+    def ocr_batch(self, paths):
+        start = time.perf_counter()
+        owners, items = [], []  # document index of every page item
+        for i, path in enumerate(paths):
+            for p in range(count_pages(path)):
+                owners.append(i)
+                items.append(self.BatchInputItem(image=load_page(path, p).convert("RGB"), prompt_type="ocr_layout"))
+        results = self.manager.generate(items)
+
+        pages = [[] for _ in paths]
+        for i, r in zip(owners, results):
+            pages[i].append(r.markdown)
+        per_doc = (time.perf_counter() - start) / max(1, len(paths))
+        return [(clean_text(" ".join(doc_pages)), per_doc) for doc_pages in pages]
+
+
+OCR_ENGINES = {"printed": PrintedOCR, "handwritten": HandwrittenOCR}
+
+
+# --- Summarization (map-reduce over token-bounded chunks) ---
+
+class Summarizer:
+    def __init__(self, model_name, batch_size, max_summary_tokens, min_summary_tokens):
+        # Loaded once; the pipeline's own tokenizer is used for chunking
+        device = 0 if torch.cuda.is_available() else -1
+        self.pipe = pipeline("summarization", model=model_name, device=device)
+        self.tokenizer = self.pipe.tokenizer
+        self.batch_size = batch_size
+        self.max_summary_tokens = max_summary_tokens
+        self.min_summary_tokens = min_summary_tokens
+
+    def _summarize(self, texts):
+        """
+        Summarizes a list of chunks in batches. Chunks are grouped by token
+        length so each group's output limits follow its own inputs, and short
+        tail chunks are not forced into long summaries.
+        """
+        lengths = [len(self.tokenizer.encode(t)) for t in texts]
+        groups = {}  # bucket -> indexes of chunks in it
+        for i, n in enumerate(lengths):
+            # Re-encoding joined sentences can add a few tokens past the chunk limit
+            bucket = next((b for b in LENGTH_BUCKETS if n <= b), LENGTH_BUCKETS[-1])
+            groups.setdefault(bucket, []).append(i)
+
+        summaries = [None] * len(texts)
+        for indexes in groups.values():
+            group_lengths = [lengths[i] for i in indexes]
+            # Like the single-image scripts: no longer than the input itself
+            max_len = min(self.max_summary_tokens, max(group_lengths))
+            min_len = min(self.min_summary_tokens, min(group_lengths) // 2)
+            outputs = self.pipe(
+                [texts[i] for i in indexes],
+                batch_size=self.batch_size,
+                max_length=max_len,
+                min_length=max(1, min_len),
+                do_sample=False,
+                truncation=True,
+            )
+            for i, o in zip(indexes, outputs):
+                summaries[i] = o['summary_text']
+        return summaries
+
+    def summarize_documents(self, texts):
+        """
+        Map: summarize every chunk of every document in shared batches.
+        Reduce: join each document's chunk summaries and summarize again
+        until a single chunk remains.
+        """
+        summaries = [None] * len(texts)
+        num_chunks = [0] * len(texts)
+        rounds = [0] * len(texts)
+        pending = {}  # doc index -> list of chunks still to reduce
+        for i, text in enumerate(texts):
+            chunks = chunk_text(text, self.tokenizer) if text else []
+            num_chunks[i] = len(chunks)
+            if chunks:
+                pending[i] = chunks
+            else:
+                summaries[i] = ""
+
+        # Each summary is far shorter than its chunk, so every round shrinks
+        while pending:
+            order = [(i, c) for i, chunks in pending.items() for c in chunks]
+            outputs = self._summarize([c for _, c in order])
+
+            grouped = {}
+            for (i, _), summary in zip(order, outputs):
+                grouped.setdefault(i, []).append(summary)
+
+            pending = {}
+            for i, parts in grouped.items():
+                rounds[i] += 1
+                if len(parts) == 1:
+                    summaries[i] = parts[0]
+                else:
+                    pending[i] = chunk_text(" ".join(parts), self.tokenizer)
+
+        return summaries, num_chunks, rounds
+
+
+# --- Main ---
+
+def process(paths, ocr, summarizer, docs_per_batch, out):
+    """
+    OCR for the next group of documents runs in the background while the
+    current group is being summarized.
+    """
+    groups = [paths[i:i + docs_per_batch] for i in range(0, len(paths), docs_per_batch)]
+    if not groups:
+        return
+
+    prefetch = ThreadPoolExecutor(max_workers=1)
+    future = prefetch.submit(ocr.ocr_batch, groups[0])
+
+    for n, group in enumerate(groups):
+        try:
+            ocr_results = future.result()
+        except Exception:
+            # One bad image fails its whole group; retry one by one
+            ocr_results = []
+            for path in group:
+                try:
+                    ocr_results.extend(ocr.ocr_batch([path]))
+                except Exception as err:
+                    print(f"OCR failed for {path}: {err}")
+                    ocr_results.append((None, 0.0))
+
+        if n + 1 < len(groups):
+            future = prefetch.submit(ocr.ocr_batch, groups[n + 1])
+
+        texts = [text or "" for text, _ in ocr_results]
+        start = time.perf_counter()
+        summaries, num_chunks, rounds = summarizer.summarize_documents(texts)
+        elapsed = time.perf_counter() - start
+
+        # Batches are shared, so summarization time is split by input length
+        total_chars = sum(len(t) for t in texts) or 1
+        for i, (path, (text, ocr_seconds)) in enumerate(zip(group, ocr_results)):
+            record = {
+                "file": path,
+                "ocr_text": text,
+                "summary": summaries[i],
+                "num_chunks": num_chunks[i],
+                "reduce_rounds": rounds[i],
+                "error": None if text is not None else "OCR failed",
+                "timings": {
+                    "ocr_seconds": round(ocr_seconds, 3),
+                    "summarize_seconds": round(elapsed * len(text or "") / total_chars, 3),
+                },
+            }
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        print(f"Processed {min((n + 1) * docs_per_batch, len(paths))}/{len(paths)} documents")
+
+    prefetch.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch OCR + summarization of image documents")
+    parser.add_argument("inputs", nargs="+", help="Image files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="summaries.jsonl", help="Output JSONL file")
+    parser.add_argument("--engine", choices=OCR_ENGINES.keys(), default="printed")
+    parser.add_argument("--model", help="Summarization model (defaults to the engine's BART model)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Chunks per summarization batch")
+    parser.add_argument("--docs-per-batch", type=int, default=16, help="Documents OCR'd ahead per group")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="OCR worker processes (the remaining cores go to the summarizer)")
+    parser.add_argument("--cache-dir", default=".ocr_cache", help="OCR result cache ('' to disable)")
+    parser.add_argument("--max-summary-tokens", type=int, default=142)
+    parser.add_argument("--min-summary-tokens", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = collect_images(args.inputs)
+    if not paths:
+        parser.error("No images found")
+    print(f"Found {len(paths)} images")
+
+    # OCR of the next group overlaps summarization, so split the cores between them
+    cores = os.cpu_count() or 1
+    torch.set_num_threads(max(1, cores - args.workers))
+
+    ocr = OCR_ENGINES[args.engine](args.workers, args.cache_dir)
+    summarizer = Summarizer(
+        args.model or ENGINE_MODELS[args.engine],
+        args.batch_size,
+        args.max_summary_tokens,
+        args.min_summary_tokens,
+    )
+
+    start = time.perf_counter()
+    with open(args.output, "w", encoding="utf-8") as out:
+        process(paths, ocr, summarizer, args.docs_per_batch, out)
+    print(f"Done in {time.perf_counter() - start:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# OCR stage: image preprocessing + parallel Tesseract + content-hash cache
+#
+# Install dependencies
+# !apt-get install -y tesseract-ocr poppler-utils
+# !pip install pytesseract pillow numpy
+# !pip install pdf2image   (only for PDF input)
+#
+# Usage:
+#   from ocrStage import OCRStage
+#   stage = OCRStage(cache_dir=".ocr_cache")
+#   text = stage.ocr_file("scan.tiff")
+
+# import libraries
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytesseract
+from PIL import Image, ImageOps
+
+# Tesseract is most accurate around 300 DPI
+TARGET_DPI = 300
+# Scanners and rendered PDF pages record their real DPI; cameras and screenshots
+# record nothing or a 72/96 placeholder, which says nothing about text size
+MIN_TRUSTED_DPI = 100
+# Skew angles (degrees) searched when deskewing
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.5
+# Deskew angle is estimated on a downscaled copy for speed
+DESKEW_SAMPLE_WIDTH = 800
+
+
+# --- Preprocessing ---
+
+def to_grayscale(image):
+    dpi = image.info.get("dpi")
+    image = ImageOps.exif_transpose(image)  # respect camera orientation
+    gray = image.convert("L")
+    if dpi:
+        gray.info["dpi"] = dpi
+    return gray
+
+
+def rescale_to_dpi(image, target_dpi=TARGET_DPI):
+    """
+    Upscales low resolution scans to target_dpi. Only a plausible DPI in the
+    file's metadata is trusted; images without one (or with a placeholder
+    DPI, like most phone photos) are left alone.
+    """
+    dpi = image.info.get("dpi")
+    if not dpi or not dpi[0] or float(dpi[0]) < MIN_TRUSTED_DPI:
+        return image
+    scale = target_dpi / float(dpi[0])
+    if scale <= 1.0:
+        return image
+    new_size = (int(image.width * scale), int(image.height * scale))
+    return image.resize(new_size, Image.LANCZOS)
+
+
+def estimate_skew(gray):
+    """
+    Projection-profile deskew: text lines are horizontal when the row
+    histogram of ink pixels is most peaked. All candidate angles are scored
+    at once by shearing the ink coordinates and binning them with NumPy.
+    """
+    sample = gray
+    if gray.width > DESKEW_SAMPLE_WIDTH:
+        ratio = DESKEW_SAMPLE_WIDTH / gray.width
+        sample = gray.resize((DESKEW_SAMPLE_WIDTH, max(1, int(gray.height * ratio))), Image.BILINEAR)
+
+    pixels = np.asarray(sample, dtype=np.uint8)
+    # Dark text on light background, using the mean as a global threshold
+    ys, xs = np.nonzero(pixels < pixels.mean())
+    if len(ys) == 0:
+        return 0.0
+
+    angles = np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + DESKEW_STEP / 2, DESKEW_STEP)
+    tans = np.tan(np.deg2rad(angles))
+
+    # Row of every ink pixel after rotating by each angle (small-angle shear)
+    rows = np.rint(ys[None, :] - xs[None, :] * tans[:, None]).astype(np.int64)
+    rows -= rows.min()
+    height = int(rows.max()) + 1
+    rows += np.arange(len(angles))[:, None] * height
+    profiles = np.bincount(rows.ravel(), minlength=len(angles) * height).reshape(len(angles), height)
+
+    # Total ink is the same for every angle, so the sum of squares ranks peakiness
+    scores = (profiles.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[int(np.argmax(scores))])
+
+
+def deskew(gray):
+    angle = estimate_skew(gray)
+    if abs(angle) < DESKEW_STEP:
+        return gray
+    return gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+
+def preprocess(image):
+    """
+    Grayscale -> DPI rescale -> deskew.
+    """
+    gray = to_grayscale(image)
+    gray = rescale_to_dpi(gray)
+    return deskew(gray)
+
+
+# --- Page splitting ---
+
+def _is_pdf(path):
+    with open(path, "rb") as f:
+        return f.read(5) == b"%PDF-" or path.lower().endswith(".pdf")
+
+
+def _pdf2image():
+    try:
+        import pdf2image
+    except ImportError:
+        raise ImportError("pdf2image is required for PDF input (pip install pdf2image)")
+    return pdf2image
+
+
+def count_pages(path):
+    """
+    Number of pages in a document, read from the header only (no decoding),
+    so the parent process can fan pages out without touching pixels.
+    """
+    if _is_pdf(path):
+        return _pdf2image().pdfinfo_from_path(path)["Pages"]
+    with Image.open(path) as image:
+        return getattr(image, "n_frames", 1)
+
+
+def load_page(path, index=0):
+    """
+    Decodes a single page of a document: a TIFF/GIF frame or a PDF page
+    rendered at TARGET_DPI (poppler reads the file directly).
+    """
+    if _is_pdf(path):
+        page = _pdf2image().convert_from_path(path, dpi=TARGET_DPI, first_page=index + 1, last_page=index + 1)[0]
+        # Rendered pages carry no DPI metadata; mark them so they are not upscaled again
+        page.info["dpi"] = (TARGET_DPI, TARGET_DPI)
+        return page
+
+    with Image.open(path) as image:
+        dpi = image.info.get("dpi")
+        image.seek(index)
+        page = image.copy()
+    if dpi:
+        page.info["dpi"] = dpi
+    return page
+
+
+# --- Worker (runs in a separate process) ---
+
+def _init_worker():
+    # One thread per Tesseract call; the pool already provides one process per core
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_page(path, index, lang, config):
+    # Decoding and preprocessing happen here, in parallel, not in the parent
+    start = time.perf_counter()
+    page = preprocess(load_page(path, index))
+    text = pytesseract.image_to_string(page, lang=lang, config=config)
+    return text, time.perf_counter() - start
+
+
+# --- OCR stage ---
+
+class OCRStage:
+    """
+    Splits documents into pages, OCRs them across a process pool and caches
+    the text by a SHA-256 of the file bytes, so repeat submissions are free.
+    """
+
+    def __init__(self, cache_dir=".ocr_cache", workers=None, lang="eng", config=""):
+        self.cache_dir = cache_dir
+        self.lang = lang
+        self.config = config
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _pool(self):
+        # Created lazily so cache-only runs never start worker processes
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self.executor
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    # --- Cache ---
+
+    def content_hash(self, data):
+        # OCR settings are part of the key: a different language is a different result
+        h = hashlib.sha256(data)
+        h.update(f"|{self.lang}|{self.config}|{TARGET_DPI}".encode())
+        return h.hexdigest()
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def cache_get(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._cache_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["pages"]
+        except (json.JSONDecodeError, KeyError):
+            return None
+
+    def cache_put(self, key, pages):
+        if not self.cache_dir:
+            return
+        path = self._cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"pages": pages}, f, ensure_ascii=False)
+        os.replace(tmp, path)  # atomic, safe with concurrent runs
+
+    # --- OCR ---
+
+    def ocr_documents(self, documents):
+        """
+        documents: list of (filename, bytes). Returns one dict per document
+        with the page texts, the summed OCR seconds and whether it was cached.
+        Pages of all uncached documents share one process pool, so a single
+        multi-page file scales with core count.
+        """
+        results = [None] * len(documents)
+        jobs = []  # (doc index, page index, future)
+        pending = {}  # doc index -> (cache key, page count)
+
+        with tempfile.TemporaryDirectory(prefix="ocr_") as tmp_dir:
+            for i, (filename, data) in enumerate(documents):
+                key = self.content_hash(data)
+                cached = self.cache_get(key)
+                if cached is not None:
+                    results[i] = {"pages": cached, "seconds": 0.0, "cached": True}
+                    continue
+                # Written once and shared by path: page tasks never pickle the file bytes
+                path = os.path.join(tmp_dir, f"{i}{os.path.splitext(filename)[1]}")
+                with open(path, "wb") as f:
+                    f.write(data)
+                num_pages = count_pages(path)
+                pending[i] = (key, num_pages)
+                for p in range(num_pages):
+                    future = self._pool().submit(_ocr_page, path, p, self.lang, self.config)
+                    jobs.append((i, p, future))
+
+            texts = {i: [None] * count for i, (_, count) in pending.items()}
+            seconds = {i: 0.0 for i in pending}
+            for i, p, future in jobs:
+                texts[i][p], elapsed = future.result()
+                seconds[i] += elapsed
+
+        for i, (key, _) in pending.items():
+            self.cache_put(key, texts[i])
+            results[i] = {"pages": texts[i], "seconds": seconds[i], "cached": False}
+        return results
+
+    def ocr_bytes(self, data, filename=""):
+        return "\n\f".join(self.ocr_documents([(filename, data)])[0]["pages"])
+
+    def ocr_file(self, path):
+        with open(path, "rb") as f:
+            return self.ocr_bytes(f.read(), os.path.basename(path))
+
+
+if __name__ == "__main__":
+    import sys
+
+    stage = OCRStage()
+    for path in sys.argv[1:]:
+        start = time.perf_counter()
+        text = stage.ocr_file(path)
+        print(f"\n📝 {path} ({time.perf_counter() - start:.2f}s):\n")
+        print(text)
+    stage.close()
@@ -0,0 +1,43 @@
+# Token-bounded text chunking for BART summarization (map-reduce)
+#
+# Shared by batchSummarize.py and the milestone_4 backend summarizer.
+# Only needs a Hugging Face tokenizer; no other dependencies.
+
+# import libraries
+import re
+
+# BART accepts 1024 positions; leave room for the <s> and </s> tokens
+MAX_CHUNK_TOKENS = 1000
+
+
+def chunk_text(text, tokenizer, max_tokens=MAX_CHUNK_TOKENS):
+    """
+    Splits text into chunks of at most max_tokens tokens, packing whole
+    sentences where possible and hard-splitting sentences that are too long.
+    """
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    chunks, current, current_len = [], [], 0
+
+    for sentence in sentences:
+        ids = tokenizer.encode(sentence, add_special_tokens=False)
+        if not ids:
+            continue
+
+        # Sentence longer than a whole chunk: flush and split it by tokens
+        if len(ids) > max_tokens:
+            if current:
+                chunks.append(" ".join(current))
+                current, current_len = [], 0
+            for i in range(0, len(ids), max_tokens):
+                chunks.append(tokenizer.decode(ids[i:i + max_tokens]))
+            continue
+
+        if current_len + len(ids) > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_len = [], 0
+        current.append(sentence)
+        current_len += len(ids)
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
@@ -0,0 +1,313 @@
+import os
+import time
+import asyncio
+import logging
+import traceback
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from market_config import MARKET_TZ, MARKET_CLOSE, RUN_DELAY_MINUTES
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration (override via environment variables) ---
+# Comma-separated list of tickers to pre-compute after market close
+DEFAULT_WATCHLIST = "RELIANCE.NS,TCS.NS,INFY.NS,HDFCBANK.NS,ICICIBANK.NS"
+WATCHLIST = [
+    t.strip().upper()
+    for t in os.getenv("FORECAST_WATCHLIST", DEFAULT_WATCHLIST).split(",")
+    if t.strip()
+]
+
+# Models to pre-compute; empty means "every installed model"
+ENABLED_MODELS = [
+    m.strip().lower()
+    for m in os.getenv("FORECAST_MODELS", "").split(",")
+    if m.strip()
+]
+
+# Forecast horizon stored per job; shorter requests are served by slicing
+PRECOMPUTE_DAYS = int(os.getenv("FORECAST_PRECOMPUTE_DAYS", "30"))
+
+# CPU budget: jobs run in niced worker processes pinned to FORECAST_CPUS cores
+# (half the machine by default), leaving the rest for live traffic
+AVAILABLE_CPUS = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+SCHEDULER_CPUS = min(len(AVAILABLE_CPUS), int(os.getenv("FORECAST_CPUS", str(max(1, len(AVAILABLE_CPUS) // 2)))))
+MAX_WORKERS = min(SCHEDULER_CPUS, int(os.getenv("FORECAST_MAX_WORKERS", str(SCHEDULER_CPUS))))
+# Intra-op threads per job (Keras/torch/XGBoost would otherwise use every core)
+THREADS_PER_WORKER = max(1, SCHEDULER_CPUS // MAX_WORKERS)
+NICE_LEVEL = int(os.getenv("FORECAST_NICE", "10"))
+
+# If yfinance has not published today's bar for some tickers yet, retry those
+# (without blocking a worker) a few times before giving up. If no ticker has
+# the bar, the session is treated as an exchange holiday and skipped.
+BAR_RETRIES = int(os.getenv("FORECAST_BAR_RETRIES", "3"))
+BAR_RETRY_MINUTES = int(os.getenv("FORECAST_BAR_RETRY_MINUTES", "15"))
+
+
+def _init_worker(cpus, threads):
+    """
+    Runs once in each scheduler process, before any model library is imported.
+    """
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    try:
+        os.nice(NICE_LEVEL)
+    except OSError:
+        pass
+
+
+def _forecast_job(fetch_data, run_model, model_names, ticker: str, session_date: str = None):
+    """
+    Runs every enabled model for one ticker inside a scheduler process.
+    With a session_date, nothing is run if that day's bar is not published yet.
+    Returns ({model: forecast}, last_bar, failures, stale).
+    """
+    forecasts, failures = {}, []
+    df = fetch_data(ticker)
+    if df.empty:
+        return forecasts, None, [{"ticker": ticker, "model": None, "error": "No historical data"}], False
+
+    last_bar = df['date'].iloc[-1]
+    if session_date and last_bar < session_date:
+        return forecasts, last_bar, failures, True
+
+    for model_name in model_names:
+        try:
+            predictions = run_model(model_name, df, PRECOMPUTE_DAYS, ticker)
+            if not predictions:
+                raise RuntimeError("Model returned no predictions")
+            forecasts[model_name] = [float(p) for p in predictions]
+        except Exception as e:
+            failures.append({"ticker": ticker, "model": model_name, "error": str(e)})
+    return forecasts, last_bar, failures, False
+
+
+class ForecastScheduler:
+    """
+    Background job that refreshes data for a watchlist once the daily bar
+    is final, runs every enabled model and caches the forecasts in memory.
+    """
+
+    def __init__(self, fetch_data, run_model, models):
+        # fetch_data(ticker) -> DataFrame, run_model(name, df, days, ticker) -> list
+        self.fetch_data = fetch_data
+        self.run_model = run_model
+        self.models = models
+        self.executor = None  # created in start(), never in the worker processes
+
+        self.cache = {}  # (model, TICKER) -> {"forecast", "generated_at", "last_bar"}
+        self.task = None
+        self.running = False
+        self.last_run_started = None
+        self.last_run_finished = None
+        self.last_run_duration = None
+        self.next_run = None
+        self.last_session = None
+        self.failures = []
+
+    # --- Cache ---
+
+    def get_cached(self, model_name: str, ticker: str, days: int):
+        entry = self.cache.get((model_name, ticker.upper()))
+        if entry is None or not 1 <= days <= len(entry["forecast"]):
+            return None
+        return {
+            "forecast": entry["forecast"][:days],
+            "generated_at": entry["generated_at"],
+        }
+
+    # --- Scheduling ---
+
+    def enabled_models(self):
+        names = ENABLED_MODELS or list(self.models.keys())
+        return [m for m in names if m in self.models and self.models[m]["func"] is not None]
+
+    def next_run_time(self, now: datetime) -> datetime:
+        """
+        Next weekday at market close + delay, in the exchange time zone.
+        """
+        now = now.astimezone(MARKET_TZ)
+        run_at = datetime.combine(now.date(), MARKET_CLOSE, tzinfo=MARKET_TZ) + timedelta(minutes=RUN_DELAY_MINUTES)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        while run_at.weekday() >= 5:  # Skip Saturday/Sunday
+            run_at += timedelta(days=1)
+        return run_at
+
+    def last_session_time(self, now: datetime) -> datetime:
+        """
+        Most recent weekday run time (market close + delay) that has passed.
+        """
+        now = now.astimezone(MARKET_TZ)
+        run_at = datetime.combine(now.date(), MARKET_CLOSE, tzinfo=MARKET_TZ) + timedelta(minutes=RUN_DELAY_MINUTES)
+        if run_at > now:
+            run_at -= timedelta(days=1)
+        while run_at.weekday() >= 5:
+            run_at -= timedelta(days=1)
+        return run_at
+
+    def _make_executor(self):
+        # spawn: forking a process with a running event loop and model threads is unsafe
+        return ProcessPoolExecutor(
+            max_workers=MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(AVAILABLE_CPUS[-SCHEDULER_CPUS:], THREADS_PER_WORKER),
+        )
+
+    def start(self):
+        if self.task is None and WATCHLIST:
+            self.executor = self._make_executor()
+            self.task = asyncio.create_task(self._loop())
+            logger.info(f"Forecast scheduler started for {len(WATCHLIST)} tickers")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def _loop(self):
+        # Catch-up: the cache lives in memory, so fill it for the last completed
+        # session right away instead of waiting for the next close
+        if not self.cache:
+            try:
+                await self.run_once(catch_up=True)
+            except Exception as e:
+                logger.error(f"Forecast scheduler catch-up run failed: {e}")
+                traceback.print_exc()
+
+        while True:
+            self.next_run = self.next_run_time(datetime.now(MARKET_TZ))
+            delay = (self.next_run - datetime.now(MARKET_TZ)).total_seconds()
+            await asyncio.sleep(max(0, delay))
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Forecast scheduler run failed: {e}")
+                traceback.print_exc()
+
+    # --- Jobs ---
+
+    async def _submit(self, ticker, model_names, session_date):
+        # A coroutine, so a submit to a broken pool fails this ticker only
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, _forecast_job, self.fetch_data, self.run_model, model_names, ticker, session_date)
+
+    async def _gather_jobs(self, tickers, model_names, session_date):
+        results = await asyncio.gather(
+            *[self._submit(t, model_names, session_date) for t in tickers],
+            return_exceptions=True,
+        )
+        return dict(zip(tickers, results))
+
+    async def _run_jobs(self, tickers, model_names, session_date):
+        results = await self._gather_jobs(tickers, model_names, session_date)
+
+        # A worker that dies (OOM kill, native crash) breaks the whole pool for
+        # good: replace it and rerun the tickers that were lost with it
+        broken = [t for t, r in results.items() if isinstance(r, BrokenProcessPool)]
+        if broken and self.executor is not None:
+            logger.warning(f"Forecast worker pool broke, restarting it and retrying {len(broken)} tickers")
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._make_executor()
+            results.update(await self._gather_jobs(broken, model_names, session_date))
+        return results
+
+    async def run_once(self, catch_up: bool = False):
+        """
+        Runs the watchlist for the last completed session. Scheduled runs
+        require that session's bar; the startup catch-up uses whatever
+        bars are latest.
+        """
+        if self.running:
+            logger.warning("Forecast scheduler run already in progress, skipping")
+            return
+        self.running = True
+        self.last_run_started = datetime.now(MARKET_TZ)
+        start = time.perf_counter()
+        session_date = self.last_session_time(self.last_run_started).strftime('%Y-%m-%d')
+        logger.info(f"Forecast scheduler {'catch-up ' if catch_up else ''}run started for session {session_date}")
+
+        try:
+            model_names = self.enabled_models()
+            required_date = None if catch_up else session_date
+            failures = []
+            pending = list(WATCHLIST)
+
+            for attempt in range(BAR_RETRIES + 1):
+                results = await self._run_jobs(pending, model_names, required_date)
+                generated_at = datetime.now(MARKET_TZ).isoformat()
+                stale = []
+
+                for ticker, result in results.items():
+                    if isinstance(result, Exception):
+                        forecasts, last_bar, errors, is_stale = {}, None, [{"ticker": ticker, "model": None, "error": str(result)}], False
+                    else:
+                        forecasts, last_bar, errors, is_stale = result
+                    if is_stale:
+                        # Keep the previous session's forecasts: they are still the latest
+                        stale.append(ticker)
+                        continue
+                    failures.extend(errors)
+                    for model_name in model_names:
+                        if model_name in forecasts:
+                            self.cache[(model_name, ticker)] = {
+                                "forecast": forecasts[model_name],
+                                "generated_at": generated_at,
+                                "last_bar": last_bar,
+                            }
+                        else:
+                            # Never serve a forecast that is older than the latest run
+                            self.cache.pop((model_name, ticker), None)
+
+                if not stale:
+                    break
+                # Nothing published even after one retry: exchange holiday
+                if len(stale) == len(WATCHLIST) and attempt >= 1:
+                    logger.info(f"No ticker has a bar for {session_date}, treating it as a market holiday")
+                    break
+                if attempt == BAR_RETRIES:
+                    failures.extend({"ticker": t, "model": None, "error": f"No bar for {session_date}"} for t in stale)
+                    break
+                logger.info(f"Daily bar not final for {len(stale)} tickers, retrying in {BAR_RETRY_MINUTES} min")
+                await asyncio.sleep(BAR_RETRY_MINUTES * 60)
+                pending = stale
+
+            self.last_session = session_date
+            self.failures = failures
+        finally:
+            self.running = False
+            self.last_run_finished = datetime.now(MARKET_TZ)
+            self.last_run_duration = round(time.perf_counter() - start, 2)
+            logger.info(f"Forecast scheduler run finished in {self.last_run_duration}s with {len(self.failures)} failures")
+
+    def status(self):
+        return {
+            "running": self.running,
+            "watchlist": WATCHLIST,
+            "models": self.enabled_models(),
+            "max_workers": MAX_WORKERS,
+            "cpus": SCHEDULER_CPUS,
+            "threads_per_worker": THREADS_PER_WORKER,
+            "precompute_days": PRECOMPUTE_DAYS,
+            "last_run_started": self.last_run_started.isoformat() if self.last_run_started else None,
+            "last_run_finished": self.last_run_finished.isoformat() if self.last_run_finished else None,
+            "last_run_duration_seconds": self.last_run_duration,
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+            "last_session": self.last_session,
+            "cached_forecasts": len(self.cache),
+            "failures": self.failures,
+        }
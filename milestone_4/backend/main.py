@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import market, auth, predict, chat
+from routers import market, auth, predict, chat, ocr
 
 app = FastAPI(title="Infosys Stock AI API")
 
@@ -17,6 +17,18 @@ app.include_router(market.router, prefix="/api/market", tags=["Market Data"])
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(predict.router, prefix="/api/predict", tags=["AI Predictions"])
 app.include_router(chat.router, prefix="/api/chat", tags=["Chatbot"])
+app.include_router(ocr.router, prefix="/api/ocr", tags=["OCR & Summarization"])
+
+# Background workers: forecast pre-computation and summarizer batching
+@app.on_event("startup")
+async def start_workers():
+    predict.scheduler.start()
+    ocr.summarizer.start()  # loads in the background
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await predict.scheduler.stop()
+    await ocr.summarizer.stop()
 
 @app.get("/")
 async def root():
@@ -0,0 +1,26 @@
+import os
+from datetime import time as dtime
+from zoneinfo import ZoneInfo
+
+# --- Configuration (override via environment variables) ---
+# The scheduler follows NSE, which closes at 15:30 IST; wait a little for the daily bar to be final
+MARKET_TZ = ZoneInfo(os.getenv("FORECAST_MARKET_TZ", "Asia/Kolkata"))
+MARKET_CLOSE = dtime(15, 30)
+RUN_DELAY_MINUTES = int(os.getenv("FORECAST_RUN_DELAY_MINUTES", "45"))
+
+# Regular-session close (local time) by exchange timezone, as reported by yfinance.
+# A ticker's daily bar is final RUN_DELAY_MINUTES after its own exchange closes.
+EXCHANGE_CLOSE = {
+    "Asia/Kolkata": dtime(15, 30),
+    "America/New_York": dtime(16, 0),
+    "America/Chicago": dtime(15, 0),
+    "America/Toronto": dtime(16, 0),
+    "Europe/London": dtime(16, 30),
+    "Europe/Berlin": dtime(17, 30),
+    "Europe/Paris": dtime(17, 30),
+    "Asia/Tokyo": dtime(15, 30),
+    "Asia/Hong_Kong": dtime(16, 0),
+    "Asia/Shanghai": dtime(15, 0),
+    "Asia/Singapore": dtime(17, 0),
+    "Australia/Sydney": dtime(16, 0),
+}
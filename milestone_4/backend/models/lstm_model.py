@@ -1,37 +1,42 @@
+import os
+import joblib
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential
+from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import LSTM, Dense
 import tensorflow as tf
+from models import model_store
 
 # Suppress TF warnings
 tf.get_logger().setLevel('ERROR')
 
-def predict_lstm(df: pd.DataFrame, days_forecast: int = 7):
+# Length of the input window (trading days)
+PREDICTION_DAYS = 60
+# Epochs run from the saved weights per incremental update
+INCREMENTAL_EPOCHS = int(os.getenv("LSTM_INCREMENTAL_EPOCHS", "3"))
+
+def make_windows(scaled_data, start: int):
     """
-    Trains a simple LSTM on the provided dataframe and forecasts future days.
-    Expected df columns: ['date', 'close', ...]
+    Builds (x, y) sequences for every target index from start onwards.
     """
+    x, y = [], []
+    for i in range(max(start, PREDICTION_DAYS), len(scaled_data)):
+        x.append(scaled_data[i-PREDICTION_DAYS:i, 0])
+        y.append(scaled_data[i, 0])
+    x, y = np.array(x), np.array(y)
+    x = np.reshape(x, (x.shape[0], x.shape[1], 1))
+    return x, y
+
+def train_full(df: pd.DataFrame):
     # 1. Prepare Data
     data = df['close'].values.reshape(-1, 1)
-    
+
     scaler = MinMaxScaler(feature_range=(0, 1))
     scaled_data = scaler.fit_transform(data)
-    
-    # Create sequences
-    prediction_days = 60
-    x_train, y_train = [], []
-    
-    if len(scaled_data) <= prediction_days:
-        return [] # Not enough data
 
-    for i in range(prediction_days, len(scaled_data)):
-        x_train.append(scaled_data[i-prediction_days:i, 0])
-        y_train.append(scaled_data[i, 0])
-        
-    x_train, y_train = np.array(x_train), np.array(y_train)
-    x_train = np.reshape(x_train, (x_train.shape[0], x_train.shape[1], 1))
+    # Create sequences
+    x_train, y_train = make_windows(scaled_data, PREDICTION_DAYS)
 
     # 2. Build Model
     model = Sequential()
@@ -41,23 +46,71 @@ def predict_lstm(df: pd.DataFrame, days_forecast: int = 7):
     model.add(Dense(units=1))
 
     model.compile(optimizer='adam', loss='mean_squared_error')
-    
+
     # Train (low epochs for demo speed)
     model.fit(x_train, y_train, batch_size=32, epochs=1, verbose=0)
+    return model, scaler
+
+def new_windows(scaler, df: pd.DataFrame, n_new: int):
+    # The scaler stays fixed between full retrains so saved weights remain valid
+    scaled_data = scaler.transform(df['close'].values.reshape(-1, 1))
+    return make_windows(scaled_data, len(scaled_data) - n_new)
+
+def evaluate(state, df: pd.DataFrame, n_new: int):
+    model, scaler = state
+    x_new, y_new = new_windows(scaler, df, n_new)
+    predicted = scaler.inverse_transform(model.predict(x_new, verbose=0))
+    actual = scaler.inverse_transform(y_new.reshape(-1, 1))
+    return model_store.mape(predicted, actual)
+
+def fine_tune(state, df: pd.DataFrame, n_new: int):
+    model, scaler = state
+    x_new, y_new = new_windows(scaler, df, n_new)
+    model.fit(x_new, y_new, batch_size=32, epochs=INCREMENTAL_EPOCHS, verbose=0)
+    return model, scaler
+
+def load(path: str):
+    model = load_model(os.path.join(path, "model.keras"))
+    scaler = joblib.load(os.path.join(path, "scaler.joblib"))
+    return model, scaler
+
+def save(state, path: str):
+    model, scaler = state
+    model.save(os.path.join(path, "model.keras"))
+    joblib.dump(scaler, os.path.join(path, "scaler.joblib"))
+
+def predict_lstm(df: pd.DataFrame, days_forecast: int = 7, ticker: str = None):
+    """
+    Trains a simple LSTM on the provided dataframe and forecasts future days.
+    Expected df columns: ['date', 'close', ...]
+    With a ticker, the saved model is fine-tuned on new windows instead
+    of being retrained on the full history (see model_store.run_update).
+    """
+    if len(df) <= PREDICTION_DAYS:
+        return [] # Not enough data
+
+    if ticker:
+        model, scaler = model_store.run_update(ticker, "lstm", df, {
+            "train_full": train_full, "load": load, "save": save,
+            "evaluate": evaluate, "fine_tune": fine_tune,
+        })
+    else:
+        model, scaler = train_full(df)
 
     # 3. Forecast
+    scaled_data = scaler.transform(df['close'].values.reshape(-1, 1))
     future_outputs = []
-    last_60_days = scaled_data[-prediction_days:]
-    
-    current_batch = last_60_days.reshape((1, prediction_days, 1))
-    
+    last_60_days = scaled_data[-PREDICTION_DAYS:]
+
+    current_batch = last_60_days.reshape((1, PREDICTION_DAYS, 1))
+
     for i in range(days_forecast):
         pred_scaled = model.predict(current_batch, verbose=0)[0]
         future_outputs.append(pred_scaled)
-        
+
         # Update batch: remove first, add new prediction
         current_batch = np.append(current_batch[:, 1:, :], [[pred_scaled]], axis=1)
 
     # Inverse transform
     predictions = scaler.inverse_transform(future_outputs)
-    return predictions.flatten().tolist()
\ No newline at end of file
+    return predictions.flatten().tolist()
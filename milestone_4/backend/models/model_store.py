@@ -0,0 +1,192 @@
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+try:
+    import fcntl
+except ImportError:  # Windows: thread lock only
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from market_config import MARKET_TZ, EXCHANGE_CLOSE, RUN_DELAY_MINUTES
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration (override via environment variables) ---
+MODEL_STORE_DIR = os.getenv("MODEL_STORE_DIR", "model_store")
+# Full retrain at least this often (calendar days), even without drift
+FULL_RETRAIN_DAYS = int(os.getenv("FULL_RETRAIN_DAYS", "30"))
+# Full retrain when the error on new bars exceeds this multiple of the running error
+DRIFT_FACTOR = float(os.getenv("DRIFT_FACTOR", "2.0"))
+# Smoothing for the running out-of-sample error
+ERROR_EMA_ALPHA = 0.3
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+@contextmanager
+def lock_for(ticker: str, model_name: str):
+    """
+    One lock per (ticker, model) so the scheduler processes and live
+    requests never update the same saved state at the same time.
+    """
+    key = (ticker.upper(), model_name)
+    with _locks_guard:
+        if key not in _locks:
+            _locks[key] = threading.Lock()
+        thread_lock = _locks[key]
+
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        # File lock for other processes (the scheduler runs in its own pool)
+        with open(os.path.join(state_dir(ticker, model_name), ".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def state_dir(ticker: str, model_name: str) -> str:
+    path = os.path.join(MODEL_STORE_DIR, ticker.upper(), model_name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_meta(ticker: str, model_name: str):
+    path = os.path.join(state_dir(ticker, model_name), "meta.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return None
+
+
+def save_meta(ticker: str, model_name: str, meta: dict):
+    path = os.path.join(state_dir(ticker, model_name), "meta.json")
+    with open(path, "w") as f:
+        json.dump(meta, f, indent=4)
+
+
+def mape(predicted, actual) -> float:
+    predicted = np.asarray(predicted, dtype=float).ravel()
+    actual = np.asarray(actual, dtype=float).ravel()
+    return float(np.mean(np.abs(predicted - actual) / np.maximum(np.abs(actual), 1e-8)))
+
+
+def closed_bars(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drops today's bar while its session is still open. During market hours
+    the history ends with a partial bar; training on it (and recording it as
+    last_date) would make the post-close run skip the final close.
+    "Today" and the close are the ticker's own exchange's (df.attrs["exchange_tz"],
+    set by fetch_historical_data). A bar counts as final RUN_DELAY_MINUTES after
+    that close; for exchanges without a known close, once the local date rolls over.
+    """
+    tz_name = df.attrs.get("exchange_tz") or MARKET_TZ.key
+    tz = ZoneInfo(tz_name)
+    now = datetime.now(tz)
+    if str(df['date'].iloc[-1]) < now.strftime('%Y-%m-%d'):
+        return df
+
+    close = EXCHANGE_CLOSE.get(tz_name)
+    if close is not None:
+        final_at = datetime.combine(now.date(), close, tzinfo=tz) + timedelta(minutes=RUN_DELAY_MINUTES)
+        if now >= final_at:
+            return df
+    return df.iloc[:-1]
+
+
+def plan_update(meta, df: pd.DataFrame):
+    """
+    Decides how to bring a saved model up to date with df.
+    Returns (mode, n_new) where mode is "full", "incremental" or "reuse".
+    """
+    if meta is None:
+        return "full", len(df)
+
+    dates = df['date'].astype(str)
+    last_date = meta["last_date"]
+    if last_date not in set(dates):
+        # History no longer lines up (gap or revised data)
+        return "full", len(df)
+
+    days_since_full = (date.fromisoformat(dates.iloc[-1]) - date.fromisoformat(meta["last_full_train"])).days
+    if days_since_full >= FULL_RETRAIN_DAYS:
+        return "full", len(df)
+
+    n_new = int((dates > last_date).sum())
+    if n_new == 0:
+        return "reuse", 0
+    return "incremental", n_new
+
+
+def run_update(ticker: str, model_name: str, df: pd.DataFrame, hooks: dict):
+    """
+    Loads the saved state for a ticker and brings it up to date with df:
+    - no state, cadence reached, or drift detected -> hooks["train_full"](df)
+    - new bars -> hooks["fine_tune"](state, df, n_new) on the new windows only
+    - no new bars -> saved state is reused as is
+
+    hooks: train_full(df), load(path), save(state, path),
+           evaluate(state, df, n_new) -> error on the new bars before training,
+           fine_tune(state, df, n_new) -> state
+    Only closed sessions are trained on (see closed_bars); the caller still
+    forecasts from the full df. Returns the up-to-date model state.
+    """
+    df = closed_bars(df)
+    with lock_for(ticker, model_name):
+        path = state_dir(ticker, model_name)
+        meta = load_meta(ticker, model_name)
+        mode, n_new = plan_update(meta, df)
+
+        state = None
+        if mode != "full":
+            try:
+                state = hooks["load"](path)
+            except Exception as e:
+                logger.warning(f"Could not load saved {model_name} state for {ticker}: {e}")
+                mode = "full"
+
+        last_date = str(df['date'].iloc[-1])
+
+        if mode == "incremental":
+            # Error on bars the model has never seen: a cheap drift signal
+            error = hooks["evaluate"](state, df, n_new)
+            running = meta.get("val_error")
+            if running is not None and error > DRIFT_FACTOR * running:
+                logger.info(f"{model_name} drift for {ticker} ({error:.4f} vs {running:.4f}), retraining")
+                mode = "full"
+            else:
+                state = hooks["fine_tune"](state, df, n_new)
+                meta["val_error"] = error if running is None else (
+                    ERROR_EMA_ALPHA * error + (1 - ERROR_EMA_ALPHA) * running
+                )
+                meta["last_date"] = last_date
+                meta["updates_since_full"] = meta.get("updates_since_full", 0) + 1
+
+        if mode == "full":
+            state = hooks["train_full"](df)
+            meta = {
+                "last_date": last_date,
+                "last_full_train": last_date,
+                "updates_since_full": 0,
+                "val_error": None,
+            }
+
+        if mode != "reuse":
+            hooks["save"](state, path)
+            save_meta(ticker, model_name, meta)
+            logger.info(f"{model_name} for {ticker}: {mode} update ({n_new} new bars)")
+        return state
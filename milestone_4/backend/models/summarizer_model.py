@@ -0,0 +1,291 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Chunking is shared with the milestone_2 batch pipeline (milestone_2/textChunking.py)
+MILESTONE_2_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "milestone_2"))
+if MILESTONE_2_DIR not in sys.path:
+    sys.path.append(MILESTONE_2_DIR)
+from textChunking import chunk_text
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration (override via environment variables) ---
+SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", "facebook/bart-large-cnn")
+MAX_BATCH_SIZE = int(os.getenv("SUMMARIZER_MAX_BATCH", "16"))
+MAX_WAIT_MS = int(os.getenv("SUMMARIZER_MAX_WAIT_MS", "50"))
+MAX_QUEUE_SIZE = int(os.getenv("SUMMARIZER_MAX_QUEUE", "256"))
+MAX_SUMMARY_TOKENS = 142
+MIN_SUMMARY_TOKENS = 20
+
+# BART accepts 1024 positions. Requests are grouped by input length so a
+# short text is never padded up to a long one in the same batch.
+MAX_INPUT_TOKENS = 1024
+BUCKETS = [128, 256, 512, MAX_INPUT_TOKENS]
+
+# Longer texts are split into chunks that fit the window (see chunk_text),
+# summarized together, then reduced to one summary
+MAX_REQUEST_TOKENS = int(os.getenv("SUMMARIZER_MAX_REQUEST_TOKENS", "8000"))
+
+
+class InputTooLongError(ValueError):
+    pass
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class SummarizerBatcher:
+    """
+    Loads the BART summarizer once per worker (on CPU) and serves requests
+    through a queue that forms micro-batches per token-length bucket. A
+    bucket is flushed when it is full or its oldest request has waited
+    MAX_WAIT_MS.
+    """
+
+    def __init__(self, model_name=SUMMARIZER_MODEL, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.pipe = None
+        self.tokenizer = None
+        self.error = None
+
+        # One inference thread: batching, not concurrency, gives the throughput
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarizer")
+        self.buckets = {limit: deque() for limit in BUCKETS}  # limit -> (text, num_tokens, future, enqueued_at)
+        self.queued = 0
+        self.wakeup = None
+        self.load_task = None
+        self.task = None
+
+        # Metrics: requests are end to end; one request can queue several chunks
+        self.latencies = deque(maxlen=1000)
+        self.chunk_latencies = deque(maxlen=1000)
+        self.batch_sizes = deque(maxlen=1000)
+        self.requests_total = 0
+        self.chunks_total = 0
+        self.batches_total = 0
+        self.rejected_total = 0
+
+    # --- Lifecycle ---
+
+    def _load(self):
+        from transformers import pipeline
+        self.pipe = pipeline("summarization", model=self.model_name, device=-1)  # CPU
+        self.tokenizer = self.pipe.tokenizer
+        logger.info(f"Summarizer {self.model_name} loaded")
+
+    def start(self):
+        """
+        Loads the model in the background so app startup (and every other
+        router) is not blocked by the download; requests get 501 until ready.
+        """
+        if self.task is None and self.load_task is None:
+            self.load_task = asyncio.create_task(self._start())
+
+    async def _start(self):
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(self.executor, self._load)
+        except ImportError as e:
+            self.error = "Transformers not installed"
+            logger.warning(f"Summarizer unavailable: {e}")
+            return
+        except Exception as e:
+            self.error = f"Summarizer failed to load: {e}"
+            logger.error(self.error)
+            return
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        for task in (self.load_task, self.task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.load_task = None
+        self.task = None
+        self.executor.shutdown(wait=False)
+
+    @property
+    def ready(self):
+        return self.task is not None
+
+    # --- Requests ---
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, truncation=False))
+
+    async def summarize_chunk(self, text: str) -> str:
+        """
+        Summarizes one text that fits BART's window, via the batcher.
+        """
+        num_tokens = self.count_tokens(text)
+        if num_tokens > MAX_INPUT_TOKENS:
+            raise InputTooLongError(f"Text is {num_tokens} tokens; limit is {MAX_INPUT_TOKENS}")
+        if self.queued >= MAX_QUEUE_SIZE:
+            raise QueueFullError("Summarizer queue is full, try again later")
+
+        bucket = next(limit for limit in BUCKETS if num_tokens <= limit)
+        future = asyncio.get_event_loop().create_future()
+        enqueued_at = time.perf_counter()
+        self.buckets[bucket].append((text, num_tokens, future, enqueued_at))
+        self.queued += 1
+        self.chunks_total += 1
+        self.wakeup.set()
+
+        summary = await future
+        self.chunk_latencies.append(time.perf_counter() - enqueued_at)
+        return summary
+
+    def truncate(self, text: str, max_tokens: int = MAX_REQUEST_TOKENS) -> str:
+        ids = self.tokenizer.encode(text, add_special_tokens=False)
+        if len(ids) <= max_tokens:
+            return text
+        return self.tokenizer.decode(ids[:max_tokens])
+
+    async def summarize(self, text: str) -> str:
+        """
+        Summarizes a request of up to MAX_REQUEST_TOKENS. Map-reduce for
+        texts longer than BART's window: every chunk goes through the batcher
+        (so chunks of one request share batches), then the joined chunk
+        summaries are summarized until one remains.
+        """
+        num_tokens = len(self.tokenizer.encode(text, add_special_tokens=False))
+        if num_tokens > MAX_REQUEST_TOKENS:
+            raise InputTooLongError(f"Text is {num_tokens} tokens; limit is {MAX_REQUEST_TOKENS}")
+
+        start = time.perf_counter()
+        self.requests_total += 1
+        chunks = chunk_text(text, self.tokenizer)
+        try:
+            # Each summary is far shorter than its chunk, so every round shrinks
+            while len(chunks) > 1:
+                self._reserve(len(chunks))
+                parts = await asyncio.gather(*[self.summarize_chunk(c) for c in chunks])
+                chunks = chunk_text(" ".join(parts), self.tokenizer)
+            if chunks:
+                self._reserve(1)
+            summary = await self.summarize_chunk(chunks[0]) if chunks else ""
+        except QueueFullError:
+            self.rejected_total += 1
+            raise
+
+        self.latencies.append(time.perf_counter() - start)
+        return summary
+
+    def _reserve(self, num_chunks):
+        # Reject a round as a whole rather than queueing part of it
+        if self.queued + num_chunks > MAX_QUEUE_SIZE:
+            raise QueueFullError("Summarizer queue is full, try again later")
+
+    # --- Batching loop ---
+
+    def _next_batch(self, now):
+        """
+        Returns (bucket, batch) for the bucket that should run now, or
+        (None, seconds until the earliest deadline).
+        """
+        best_bucket, oldest = None, None
+        for limit, queue in self.buckets.items():
+            if not queue:
+                continue
+            if len(queue) >= self.max_batch_size:
+                return limit, None
+            if oldest is None or queue[0][3] < oldest:
+                best_bucket, oldest = limit, queue[0][3]
+
+        if best_bucket is None:
+            return None, None
+        wait = oldest + self.max_wait - now
+        if wait <= 0:
+            return best_bucket, None
+        return None, wait
+
+    def _run_batch(self, texts, lengths):
+        # Like batchSummarize: no longer than the longest input, and short
+        # inputs are never padded out to MIN_SUMMARY_TOKENS
+        max_len = min(MAX_SUMMARY_TOKENS, max(lengths))
+        min_len = min(MIN_SUMMARY_TOKENS, min(lengths) // 2)
+        outputs = self.pipe(
+            texts,
+            batch_size=len(texts),
+            max_length=max_len,
+            min_length=max(1, min_len),
+            do_sample=False,
+            truncation=True,
+        )
+        return [o['summary_text'] for o in outputs]
+
+    async def _loop(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            bucket, wait = self._next_batch(time.perf_counter())
+            if bucket is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            queue = self.buckets[bucket]
+            batch = [queue.popleft() for _ in range(min(self.max_batch_size, len(queue)))]
+            self.queued -= len(batch)
+            self.batch_sizes.append(len(batch))
+            self.batches_total += 1
+
+            try:
+                summaries = await loop.run_in_executor(
+                    self.executor, self._run_batch, [b[0] for b in batch], [b[1] for b in batch]
+                )
+                for (_, _, future, _), summary in zip(batch, summaries):
+                    if not future.done():
+                        future.set_result(summary)
+            except Exception as e:
+                logger.error(f"Summarizer batch failed: {e}")
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError(f"Summarization failed: {e}"))
+
+    # --- Metrics ---
+
+    def metrics(self):
+        def percentile(values, p):
+            values = sorted(values)
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 1)
+
+        sizes = list(self.batch_sizes)
+        return {
+            "model": self.model_name,
+            "ready": self.ready,
+            "loading": self.load_task is not None and not self.load_task.done(),
+            "error": self.error,
+            "queued_chunks": self.queued,
+            "requests_total": self.requests_total,
+            "chunks_total": self.chunks_total,
+            "batches_total": self.batches_total,
+            "rejected_total": self.rejected_total,
+            # End to end per request (all chunks and reduce rounds)
+            "latency_ms": {"p50": percentile(self.latencies, 0.50), "p95": percentile(self.latencies, 0.95)},
+            # Queue wait + inference per chunk
+            "chunk_latency_ms": {"p50": percentile(self.chunk_latencies, 0.50), "p95": percentile(self.chunk_latencies, 0.95)},
+            "batch_size": {
+                "mean": round(sum(sizes) / len(sizes), 2) if sizes else None,
+                "max": max(sizes) if sizes else None,
+            },
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": int(self.max_wait * 1000),
+        }
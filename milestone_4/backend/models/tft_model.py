@@ -1,8 +1,15 @@
+import os
 import pandas as pd
 import numpy as np
 import torch
 import random
 import torch.nn as nn
+from models import model_store
+
+# Length of the learned positional encoding; inputs never exceed it
+MAX_POSITIONS = 500
+# Epochs run from the saved weights per incremental update
+INCREMENTAL_EPOCHS = int(os.getenv("TFT_INCREMENTAL_EPOCHS", "3"))
 
 class SimpleTransformer(nn.Module):
     def __init__(self, feature_size=1, d_model=32, num_layers=2, dropout=0.1):
@@ -13,8 +20,8 @@ class SimpleTransformer(nn.Module):
         self.encoder_input_layer = nn.Linear(feature_size, d_model)
         
         # 2. Positional Encoding (Learnable)
-        # Max sequence length 500 is sufficient for our 60-90 day windows
-        self.pos_encoder = nn.Parameter(torch.zeros(1, 500, d_model)) 
+        # Inputs are capped at MAX_POSITIONS (about 2 years of daily bars)
+        self.pos_encoder = nn.Parameter(torch.zeros(1, MAX_POSITIONS, d_model)) 
         
         # 3. Transformer Encoder
         self.encoder_layer = nn.TransformerEncoderLayer(d_model=d_model, nhead=4, dim_feedforward=64, dropout=dropout)
@@ -52,18 +59,14 @@ class SimpleTransformer(nn.Module):
         output = self.decoder(output)
         return output
 
-def predict_tft(df: pd.DataFrame, days_forecast: int = 7):
-    """
-    Implementation of a basic Transformer for Time Series (TFT proxy).
-    Real TFT requires 'pytorch-forecasting' TimeSeriesDataSet setup which is complex for a simple API.
-    """
+def train_full(df: pd.DataFrame):
     # 0. Set Seeds for Consistency
     torch.manual_seed(42)
     np.random.seed(42)
     random.seed(42)
 
-    # 1. Data Prep
-    data = df['close'].values.astype(float)
+    # 1. Data Prep (most recent MAX_POSITIONS bars, so Input[:-1] fits the encoding)
+    data = df['close'].values.astype(float)[-MAX_POSITIONS:]
     max_val = np.max(data)
     data = data / max_val # Normalize
     
@@ -87,14 +90,85 @@ def predict_tft(df: pd.DataFrame, days_forecast: int = 7):
         loss.backward()
         optimizer.step()
         
+    return model, optimizer, max_val
+
+def history_window(max_val, df: pd.DataFrame):
+    """
+    Returns the same normalized history (last MAX_POSITIONS bars) that the
+    model trains and forecasts on, so every bar keeps its learned position.
+    """
+    # Normalization stays fixed between full retrains so saved weights remain valid
+    data = df['close'].values.astype(float)[-MAX_POSITIONS:] / max_val
+    return torch.FloatTensor(data).view(-1, 1, 1)
+
+def evaluate(state, df: pd.DataFrame, n_new: int):
+    model, _, max_val = state
+    window = history_window(max_val, df)
+    n_new = min(n_new, len(window) - 1)
+    model.eval()
+    with torch.no_grad():
+        output = model(window[:-1])
+    return model_store.mape(output[-n_new:].numpy(), window[-n_new:].numpy())
+
+def fine_tune(state, df: pd.DataFrame, n_new: int):
+    model, optimizer, max_val = state
+    window = history_window(max_val, df)
+    n_new = min(n_new, len(window) - 1)
+    criterion = nn.MSELoss()
+
+    model.train()
+    for epoch in range(INCREMENTAL_EPOCHS):
+        optimizer.zero_grad()
+        # One forward pass over the full history; loss only on the new targets
+        output = model(window[:-1])
+        loss = criterion(output[-n_new:], window[-n_new:])
+        loss.backward()
+        optimizer.step()
+    return model, optimizer, max_val
+
+def load(path: str):
+    checkpoint = torch.load(os.path.join(path, "model.pt"))
+    model = SimpleTransformer(feature_size=1, d_model=16, num_layers=2)
+    model.load_state_dict(checkpoint["model"])
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.005)
+    optimizer.load_state_dict(checkpoint["optimizer"])
+    return model, optimizer, checkpoint["max_val"]
+
+def save(state, path: str):
+    model, optimizer, max_val = state
+    torch.save({
+        "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "max_val": float(max_val),
+    }, os.path.join(path, "model.pt"))
+
+def predict_tft(df: pd.DataFrame, days_forecast: int = 7, ticker: str = None):
+    """
+    Implementation of a basic Transformer for Time Series (TFT proxy).
+    Real TFT requires 'pytorch-forecasting' TimeSeriesDataSet setup which is complex for a simple API.
+    With a ticker, the saved model is fine-tuned on new bars instead
+    of being retrained on the full history (see model_store.run_update).
+    """
+    if ticker:
+        model, _, max_val = model_store.run_update(ticker, "tft", df, {
+            "train_full": train_full, "load": load, "save": save,
+            "evaluate": evaluate, "fine_tune": fine_tune,
+        })
+    else:
+        model, _, max_val = train_full(df)
+
+    data_tensor = history_window(max_val, df)
+        
     # 4. Predict
     model.eval()
     predictions = []
-    current_input = data_tensor
+    # Sliding window as long as the training input, so the latest bar sits at
+    # the same position it was trained at and the horizon never overflows
+    window_len = len(data_tensor) - 1
+    current_input = data_tensor[-window_len:]
     
     with torch.no_grad():
         for _ in range(days_forecast):
-            # Model takes full history to predict next step
             out = model(current_input)
             
             # Get the last prediction (next step)
@@ -104,9 +178,9 @@ def predict_tft(df: pd.DataFrame, days_forecast: int = 7):
             pred_price = next_val * max_val
             predictions.append(pred_price)
             
-            # Append prediction to input for autoregressive generation
+            # Slide the window: drop the oldest bar, append the prediction
             next_tensor = torch.FloatTensor([[[next_val]]])
-            current_input = torch.cat((current_input, next_tensor), 0)
+            current_input = torch.cat((current_input[1:], next_tensor), 0)
             
     # Return consistently rounded values (2 decimal places like dashboard)
     return [round(float(p), 2) for p in predictions]
\ No newline at end of file
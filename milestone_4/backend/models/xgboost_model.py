@@ -1,50 +1,92 @@
+import os
 import pandas as pd
 import numpy as np
 from xgboost import XGBRegressor
+from models import model_store
 
-def predict_xgboost(df: pd.DataFrame, days_forecast: int = 7):
+FEATURES = [f'lag_{i}' for i in range(1, 4)]
+TARGET = 'close'
+# Extra trees boosted on top of the saved model per incremental update
+INCREMENTAL_TREES = int(os.getenv("XGB_INCREMENTAL_TREES", "10"))
+# Recent rows fitted together with the new ones, so added trees can split
+# instead of shifting every prediction by the latest residual
+CONTEXT_DAYS = int(os.getenv("XGB_CONTEXT_DAYS", "60"))
+# Below this many rows no further boosting is done
+MIN_INCREMENTAL_ROWS = 20
+
+def make_features(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    
+    # Ensure date is datetime
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'])
+        
+    df = df.set_index('date')
+    
+    # Create Lag Features (Window Size = 3)
+    for i in range(1, 4):
+        df[f'lag_{i}'] = df['close'].shift(i)
+        
+    return df.dropna()
+
+def train_full(df: pd.DataFrame):
+    feats = make_features(df)
+    model = XGBRegressor(objective='reg:squarederror', n_estimators=100)
+    model.fit(feats[FEATURES], feats[TARGET])
+    return model
+
+def evaluate(model, df: pd.DataFrame, n_new: int):
+    new = make_features(df).tail(n_new)
+    return model_store.mape(model.predict(new[FEATURES]), new[TARGET])
+
+def fine_tune(model, df: pd.DataFrame, n_new: int):
+    # Continue boosting from the saved trees on the new rows plus recent context
+    new = make_features(df).tail(n_new + CONTEXT_DAYS)
+    if len(new) < MIN_INCREMENTAL_ROWS:
+        return model
+    updated = XGBRegressor(objective='reg:squarederror', n_estimators=INCREMENTAL_TREES)
+    updated.fit(new[FEATURES], new[TARGET], xgb_model=model.get_booster())
+    return updated
+
+def load(path: str):
+    model = XGBRegressor()
+    model.load_model(os.path.join(path, "model.json"))
+    return model
+
+def save(model, path: str):
+    model.save_model(os.path.join(path, "model.json"))
+
+def predict_xgboost(df: pd.DataFrame, days_forecast: int = 7, ticker: str = None):
     """
     Trains an XGBoost model using lagged features.
+    With a ticker, the saved model is warm-started on new bars instead
+    of being retrained on the full history (see model_store.run_update).
     """
     try:
-        df = df.copy()
-        
-        # Ensure date is datetime
-        if not pd.api.types.is_datetime64_any_dtype(df['date']):
-            df['date'] = pd.to_datetime(df['date'])
-            
-        df = df.set_index('date')
-        
-        # Create Lag Features (Window Size = 3)
-        for i in range(1, 4):
-            df[f'lag_{i}'] = df['close'].shift(i)
-            
-        df = df.dropna()
+        df_feats = make_features(df)
         
         # Ensure sufficient data exists for training
-        if df.empty or len(df) < 10:
+        if df_feats.empty or len(df_feats) < 10:
             return []
 
-        features = [f'lag_{i}' for i in range(1, 4)]
-        target = 'close'
-        
-        X = df[features]
-        y = df[target]
-        
-        # Train Model
-        model = XGBRegressor(objective='reg:squarederror', n_estimators=100)
-        model.fit(X, y)
+        if ticker:
+            model = model_store.run_update(ticker, "xgboost", df, {
+                "train_full": train_full, "load": load, "save": save,
+                "evaluate": evaluate, "fine_tune": fine_tune,
+            })
+        else:
+            model = train_full(df)
         
         # --- Forecast Loop ---
         # 1. Extract the last known window of data to start predictions
-        last_known_row = df.iloc[-1][features]
+        last_known_row = df_feats.iloc[-1][FEATURES]
         current_input_values = last_known_row.values # Array: [lag_1, lag_2, lag_3]
         
         predictions = []
         
         for _ in range(days_forecast):
             # Fix: Convert input to DataFrame with feature names to satisfy XGBoost strict mode
-            input_df = pd.DataFrame([current_input_values], columns=features)
+            input_df = pd.DataFrame([current_input_values], columns=FEATURES)
             
             # Predict next value
             next_pred = model.predict(input_df)[0]
@@ -0,0 +1,108 @@
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from pydantic import BaseModel
+import asyncio
+import io
+import re
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from models.summarizer_model import SummarizerBatcher, InputTooLongError, QueueFullError, MAX_REQUEST_TOKENS
+
+# Configure Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Import OCR gracefully
+try:
+    import pytesseract
+    from PIL import Image, ImageOps
+    OCR_ERROR = None
+except ImportError as e:
+    OCR_ERROR = "pytesseract/Pillow not installed"
+    logger.warning(f"OCR unavailable: {e}")
+
+router = APIRouter()
+
+# Request-size limits
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024  # 10 MB
+# Cheap pre-check before tokenizing; the authoritative limit is MAX_REQUEST_TOKENS
+# (English BPE averages ~4 characters per token, so this only trips on abuse)
+MAX_TEXT_CHARS = MAX_REQUEST_TOKENS * 8
+ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/bmp", "image/tiff", "image/webp"}
+
+# Loaded once per worker; started/stopped in main.py
+summarizer = SummarizerBatcher()
+
+# Tesseract runs as a subprocess, so threads are enough to parallelize it
+ocr_executor = ThreadPoolExecutor(max_workers=4)
+
+# --- Models ---
+class SummarizeRequest(BaseModel):
+    text: str
+
+# --- Helper Functions ---
+def clean_text(text: str) -> str:
+    return re.sub(r'[\n\f]+', ' ', text).strip()
+
+def run_ocr(data: bytes) -> str:
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image).convert("L")
+    return pytesseract.image_to_string(image)
+
+async def summarize_text(text: str) -> str:
+    if not summarizer.ready:
+        raise HTTPException(status_code=501, detail=summarizer.error or "Summarizer is still loading, try again shortly")
+    try:
+        return await summarizer.summarize(text)
+    except InputTooLongError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Endpoints ---
+
+@router.get("/metrics")
+async def get_metrics():
+    return summarizer.metrics()
+
+@router.post("/summarize")
+async def summarize(request: SummarizeRequest):
+    text = clean_text(request.text)
+    if not text:
+        raise HTTPException(status_code=400, detail="Text is empty")
+    if len(text) > MAX_TEXT_CHARS:
+        raise HTTPException(status_code=413, detail=f"Text exceeds {MAX_TEXT_CHARS} characters")
+
+    summary = await summarize_text(text)
+    return {"summary": summary}
+
+@router.post("/image")
+async def ocr_image(file: UploadFile = File(...), with_summary: bool = True):
+    if OCR_ERROR:
+        raise HTTPException(status_code=501, detail=OCR_ERROR)
+    if file.content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported file type: {file.content_type}")
+
+    # Starlette has already spooled the upload (to disk past 1 MB); reading one
+    # byte past the limit keeps oversized files out of memory and the OCR pool
+    data = await file.read(MAX_UPLOAD_BYTES + 1)
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+
+    try:
+        loop = asyncio.get_event_loop()
+        ocr_text = await loop.run_in_executor(ocr_executor, run_ocr, data)
+    except Exception as e:
+        logger.error(f"OCR Error: {e}")
+        raise HTTPException(status_code=400, detail=f"Could not read image: {e}")
+
+    text = clean_text(ocr_text)
+    result = {"filename": file.filename, "ocr_text": text, "summary": None}
+    if with_summary and text:
+        # OCR work is already done: summarize what fits instead of rejecting the page
+        if summarizer.ready:
+            text = summarizer.truncate(text[:MAX_TEXT_CHARS])
+        result["summary"] = await summarize_text(text)
+    return result
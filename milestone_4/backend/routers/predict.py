@@ -12,6 +12,7 @@ import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import logging
 import traceback
+from forecast_scheduler import ForecastScheduler
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
@@ -67,6 +68,9 @@ except ImportError as e:
     logger.warning(f"TFT unavailable: {e}")
 
 
+# Models that keep per-ticker state and warm-start on new bars (models/model_store.py)
+INCREMENTAL_MODELS = {"lstm", "xgboost", "tft"}
+
 router = APIRouter()
 executor = ThreadPoolExecutor(max_workers=3)
 
@@ -88,7 +92,11 @@ def fetch_historical_data(ticker: str):
         hist.reset_index(inplace=True)
         
         # Ensure Date column is string format YYYY-MM-DD
+        exchange_tz = None
         if 'Date' in hist.columns:
+            # Dates come in the exchange's own timezone; keep its name for model_store.closed_bars
+            if hist['Date'].dt.tz is not None:
+                exchange_tz = str(hist['Date'].dt.tz)
             hist['Date'] = hist['Date'].dt.strftime('%Y-%m-%d')
             
         # Standardize column names to lowercase
@@ -98,14 +106,18 @@ def fetch_historical_data(ticker: str):
         if 'date' not in hist.columns or 'close' not in hist.columns:
             return pd.DataFrame()
 
-        return hist[['date', 'close']]
+        df = hist[['date', 'close']]
+        df.attrs["exchange_tz"] = exchange_tz
+        return df
     except Exception as e:
         logger.error(f"Error fetching data: {e}")
         return pd.DataFrame()
 
-def run_model(model_name: str, df: pd.DataFrame, days: int):
+def run_model(model_name: str, df: pd.DataFrame, days: int, ticker: str = None):
     """
     Routes to the correct model function.
+    With a ticker, incremental models update their saved state instead of
+    retraining on the full history.
     """
     model_info = MODELS.get(model_name)
     
@@ -123,19 +135,39 @@ def run_model(model_name: str, df: pd.DataFrame, days: int):
     # 3. Run Prediction
     try:
         logger.info(f"Running {model_name} for {days} days...")
-        predictions = model_info["func"](df, days)
+        if ticker and model_name in INCREMENTAL_MODELS:
+            predictions = model_info["func"](df, days, ticker=ticker)
+        else:
+            predictions = model_info["func"](df, days)
         return predictions
     except Exception as e:
         logger.error(f"Runtime error in {model_name}: {e}")
         traceback.print_exc()
         raise RuntimeError(f"Model execution failed: {str(e)}")
 
+# Post-close pre-computation for the configured watchlist (started in main.py)
+scheduler = ForecastScheduler(fetch_historical_data, run_model, MODELS)
+
+@router.get("/scheduler/status")
+async def get_scheduler_status():
+    return scheduler.status()
+
 @router.get("/{model_name}/{ticker}")
-async def get_prediction(model_name: str, ticker: str, days: int = 7):
+async def get_prediction(model_name: str, ticker: str, days: int = Query(7, ge=1)):
     model_name = model_name.lower()
     if model_name not in MODELS:
         raise HTTPException(status_code=400, detail="Invalid model name")
     
+    # 0. Serve pre-computed forecast if the scheduler has one
+    cached = scheduler.get_cached(model_name, ticker, days)
+    if cached:
+        return {
+            "model": model_name,
+            "ticker": ticker.upper(),
+            "forecast": cached["forecast"],
+            "generated_at": cached["generated_at"]
+        }
+
     try:
         loop = asyncio.get_event_loop()
         
@@ -147,7 +179,7 @@ async def get_prediction(model_name: str, ticker: str, days: int = 7):
 
         # 2. Run Prediction (Wrapped to catch internal errors)
         try:
-            predictions = await loop.run_in_executor(executor, run_model, model_name, df, days)
+            predictions = await loop.run_in_executor(executor, run_model, model_name, df, days, ticker)
         except ImportError as ie:
             raise HTTPException(status_code=501, detail=str(ie)) # Not Implemented / Missing Lib
         except ValueError as ve: